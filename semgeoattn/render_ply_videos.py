@@ -2,7 +2,7 @@
 Render rotating videos of PLY models with vertex colors (saliency maps).
 
 Requirements:
-    pip install open3d opencv-python numpy
+    pip install open3d imageio[ffmpeg] numpy
 
 Usage:
     python render_ply_videos.py
@@ -10,8 +10,17 @@ Usage:
 
 import open3d as o3d
 import numpy as np
-import cv2
+import imageio
+import imageio_ffmpeg
+import multiprocessing
+import multiprocessing.util
 import os
+import queue
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 
 # Configuration
@@ -19,14 +28,144 @@ INPUT_DIR = "assets/models"
 OUTPUT_DIR = "assets/videos"
 VIDEO_WIDTH = 640
 VIDEO_HEIGHT = 480
+RENDER_WIDTH = 320  # Frames are rendered at this size and upscaled by FFmpeg
+RENDER_HEIGHT = 240
 FPS = 30
 DURATION_SECONDS = 6  # Full rotation duration
 TOTAL_FRAMES = FPS * DURATION_SECONDS
 BACKGROUND_COLOR = [0.1, 0.1, 0.15]  # Dark blue-gray background
+ENCODER_QUEUE_SIZE = 4  # Frames buffered between renderer and encoder
+
+# FFmpeg filter upscaling rendered frames to the output video size
+_UPSCALE_PARAMS = ["-vf", f"scale={VIDEO_WIDTH}:{VIDEO_HEIGHT}:flags=lanczos"]
+
+# H.264 encoders in order of preference: (ffmpeg codec, imageio quality,
+# extra ffmpeg params). imageio only maps quality to -crf for libx264, so
+# hardware encoders set their own rate control instead.
+VIDEO_ENCODERS = [
+    ("h264_nvenc", None, ["-preset", "p4", "-gpu", "0", "-rc", "vbr", "-cq", "23"]),
+    ("h264_videotoolbox", None, ["-b:v", "4M"]),
+    ("libx264", 8, ["-preset", "veryfast", "-threads", "0"]),
+]
+SOFTWARE_ENCODER = VIDEO_ENCODERS[-1]
+MAX_HARDWARE_SESSIONS = 3  # Consumer GPUs cap concurrent encode sessions
+
+# Integer color types and their full-scale value, as Open3D normalizes them
+_PLY_COLOR_SCALES = {np.dtype("u1"): 255.0, np.dtype("<u2"): 65535.0}
+
+# PLY property types understood by the fast binary reader
+_PLY_DTYPES = {
+    b"char": "i1", b"int8": "i1",
+    b"uchar": "u1", b"uint8": "u1",
+    b"short": "<i2", b"int16": "<i2",
+    b"ushort": "<u2", b"uint16": "<u2",
+    b"int": "<i4", b"int32": "<i4",
+    b"uint": "<u4", b"uint32": "<u4",
+    b"float": "<f4", b"float32": "<f4",
+    b"double": "<f8", b"float64": "<f8",
+}
+
+
+def fast_read_ply(filepath):
+    """Read a binary little-endian PLY straight into NumPy arrays.
+
+    Returns (vertices, colors, normals, faces), where colors, normals and
+    faces may be None, or None if the file layout is not handled by this
+    fast path.
+    """
+    with open(filepath, "rb") as f:
+        if f.readline().strip() != b"ply":
+            return None
+
+        # Parse the ASCII header into (name, count, properties) entries
+        file_format = None
+        elements = []
+        while True:
+            line = f.readline()
+            if not line:
+                return None
+            tokens = line.split()
+            if not tokens:
+                continue
+            if tokens[0] == b"end_header":
+                break
+            if tokens[0] == b"format":
+                file_format = tokens[1]
+            elif tokens[0] == b"element":
+                elements.append((tokens[1], int(tokens[2]), []))
+            elif tokens[0] == b"property" and elements:
+                elements[-1][2].append(tokens[1:])
+
+        if file_format != b"binary_little_endian":
+            return None
+
+        vertices = colors = normals = faces = None
+        for name, count, props in elements:
+            if name == b"vertex":
+                # Vertex records are interleaved; read them as one structured block
+                if any(p[0] not in _PLY_DTYPES for p in props):
+                    return None
+                dtype = np.dtype([(p[1].decode(), _PLY_DTYPES[p[0]]) for p in props])
+                data = np.fromfile(f, dtype=dtype, count=count)
+                if len(data) != count or not {"x", "y", "z"} <= set(dtype.names):
+                    return None
+                vertices = np.column_stack([data["x"], data["y"], data["z"]]).astype(np.float64)
+
+                if {"red", "green", "blue"} <= set(dtype.names):
+                    # Scale integer colors to [0, 1] like Open3D; floats are kept as-is
+                    color_type = dtype["red"]
+                    if color_type.kind != "f" and color_type not in _PLY_COLOR_SCALES:
+                        return None
+                    colors = np.column_stack([data["red"], data["green"], data["blue"]]).astype(np.float64)
+                    if color_type in _PLY_COLOR_SCALES:
+                        colors /= _PLY_COLOR_SCALES[color_type]
+
+                if {"nx", "ny", "nz"} <= set(dtype.names):
+                    normals = np.column_stack([data["nx"], data["ny"], data["nz"]]).astype(np.float64)
+            elif name == b"face" and len(props) == 1 and props[0][0] == b"list":
+                # Only triangle faces ("list <count type> <index type> ...")
+                count_type, index_type = props[0][1], props[0][2]
+                if count_type not in _PLY_DTYPES or index_type not in _PLY_DTYPES:
+                    return None
+                dtype = np.dtype([("n", _PLY_DTYPES[count_type]), ("i", _PLY_DTYPES[index_type], 3)])
+                data = np.fromfile(f, dtype=dtype, count=count)
+                if len(data) != count or np.any(data["n"] != 3):
+                    return None
+                faces = data["i"].astype(np.int32)
+            else:
+                return None
+
+    if vertices is None:
+        return None
+    return vertices, colors, normals, faces
 
 
 def load_ply_with_colors(filepath):
     """Load PLY file and return mesh or point cloud with colors."""
+    # Fast path: build the geometry directly from NumPy buffers
+    parsed = fast_read_ply(filepath)
+    if parsed is not None:
+        vertices, colors, normals, faces = parsed
+
+        if faces is not None and len(faces) > 0:
+            mesh = o3d.geometry.TriangleMesh(
+                o3d.utility.Vector3dVector(vertices),
+                o3d.utility.Vector3iVector(faces),
+            )
+            mesh.compute_vertex_normals()
+            if colors is not None:
+                mesh.vertex_colors = o3d.utility.Vector3dVector(colors)
+            else:
+                mesh.paint_uniform_color([0.7, 0.7, 0.7])
+            return mesh, "mesh"
+
+        pcd = o3d.geometry.PointCloud(o3d.utility.Vector3dVector(vertices))
+        if colors is not None:
+            pcd.colors = o3d.utility.Vector3dVector(colors)
+        if normals is not None:
+            pcd.normals = o3d.utility.Vector3dVector(normals)
+        return pcd, "pointcloud"
+
     # Try loading as mesh first
     mesh = o3d.io.read_triangle_mesh(filepath)
 
@@ -51,38 +190,123 @@ def load_ply_with_colors(filepath):
 
 def center_and_scale(geometry):
     """Center geometry at origin and scale to fit view."""
+    # Zero-copy view of the vertex buffer, transformed in place
+    if isinstance(geometry, o3d.geometry.TriangleMesh):
+        vertices = np.asarray(geometry.vertices)
+    else:
+        vertices = np.asarray(geometry.points)
+
+    if len(vertices) == 0:
+        return geometry
+
     # Get bounding box
-    bbox = geometry.get_axis_aligned_bounding_box()
-    center = bbox.get_center()
+    lo = vertices.min(axis=0)
+    hi = vertices.max(axis=0)
 
     # Center the geometry
-    geometry.translate(-center)
+    np.subtract(vertices, 0.5 * (lo + hi), out=vertices)
 
     # Scale to fit in unit sphere
-    extent = bbox.get_extent()
-    max_extent = max(extent)
+    max_extent = (hi - lo).max()
     if max_extent > 0:
-        geometry.scale(1.8 / max_extent, center=[0, 0, 0])
+        np.multiply(vertices, 1.8 / max_extent, out=vertices)
 
     return geometry
 
 
-def render_rotating_video(geometry, geo_type, output_path, model_name):
-    """Render a rotating video of the geometry."""
+def _rot_y(angles):
+    """Return an (N, 4, 4) stack of homogeneous rotations about the world Y (up) axis."""
+    c, s = np.cos(angles), np.sin(angles)
+    rotations = np.zeros((len(angles), 4, 4))
+    rotations[:, 0, 0] = c
+    rotations[:, 0, 2] = s
+    rotations[:, 2, 0] = -s
+    rotations[:, 2, 2] = c
+    rotations[:, 1, 1] = 1.0
+    rotations[:, 3, 3] = 1.0
+    return rotations
+
+
+def open_video_writer(output_path, video_encoder):
+    """Open an FFmpeg video writer for one of the VIDEO_ENCODERS entries."""
+    codec, quality, ffmpeg_params = video_encoder
+    return imageio.get_writer(
+        output_path, fps=FPS, codec=codec, quality=quality,
+        macro_block_size=1,
+        ffmpeg_params=[*_UPSCALE_PARAMS, *ffmpeg_params],
+    )
+
+
+def select_video_encoder():
+    """Return the first VIDEO_ENCODERS entry that works here."""
+    available = subprocess.run(
+        [imageio_ffmpeg.get_ffmpeg_exe(), "-hide_banner", "-encoders"],
+        capture_output=True, text=True,
+    ).stdout
+
+    for video_encoder in VIDEO_ENCODERS[:-1]:
+        if video_encoder[0] not in available:
+            continue
+        # A listed hardware encoder may still lack a device or reject the
+        # options; probe with one frame, opened exactly like a real writer
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            probe_path = os.path.join(tmp_dir, "probe.mp4")
+            try:
+                writer = open_video_writer(probe_path, video_encoder)
+                writer.append_data(np.zeros((RENDER_HEIGHT, RENDER_WIDTH, 3), np.uint8))
+                writer.close()
+            except Exception:
+                continue
+            if os.path.exists(probe_path) and os.path.getsize(probe_path) > 0:
+                return video_encoder
+
+    return SOFTWARE_ENCODER
+
+
+def _encoder_worker(frame_queue, video_writer, errors):
+    """Convert and write frames from the queue until a None sentinel is received.
+
+    Frames arrive as float [0, 1] captures; converting them here overlaps the
+    conversion with rendering of the next frame on the main thread. A write
+    failure is appended to errors and the queue is still drained, so the
+    renderer never blocks on a full queue.
+    """
+    # Reusable output buffer; append_data() copies the frame out before returning
+    frame_u8 = np.empty((RENDER_HEIGHT, RENDER_WIDTH, 3), np.uint8)
+
+    while (image := frame_queue.get()) is not None:
+        if errors:
+            continue
+        try:
+            # Scale and truncate to uint8 in a single pass, no float scratch buffer
+            np.multiply(image, 255.0, out=frame_u8, casting="unsafe")
+            video_writer.append_data(frame_u8)
+        except Exception as e:
+            errors.append(e)
 
-    # Create visualizer
-    vis = o3d.visualization.Visualizer()
-    vis.create_window(width=VIDEO_WIDTH, height=VIDEO_HEIGHT, visible=False)
 
-    # Add geometry
-    vis.add_geometry(geometry)
+def create_visualizer():
+    """Create the hidden visualizer window shared by all renders in a process."""
+    vis = o3d.visualization.Visualizer()
+    if not vis.create_window(width=RENDER_WIDTH, height=RENDER_HEIGHT, visible=False):
+        raise RuntimeError("could not create an Open3D window (no OpenGL context?)")
 
     # Set render options
     render_option = vis.get_render_option()
     render_option.background_color = np.array(BACKGROUND_COLOR)
-    render_option.point_size = 3.0
+    render_option.point_size = 3.0 * RENDER_WIDTH / VIDEO_WIDTH  # 3 px in the output
     render_option.light_on = True
 
+    return vis
+
+
+def render_rotating_video(vis, geometry, geo_type, output_path, model_name, video_encoder):
+    """Render a rotating video of the geometry."""
+
+    # Replace the previous file's geometry and refit the view to this one
+    vis.clear_geometries()
+    vis.add_geometry(geometry, reset_bounding_box=True)
+
     # Get view control
     view_ctrl = vis.get_view_control()
 
@@ -91,37 +315,127 @@ def render_rotating_video(geometry, geo_type, output_path, model_name):
     view_ctrl.set_front([0, 0, -1])
     view_ctrl.set_up([0, 1, 0])
 
-    # Setup video writer
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    video_writer = cv2.VideoWriter(output_path, fourcc, FPS, (VIDEO_WIDTH, VIDEO_HEIGHT))
-
-    print(f"  Rendering {TOTAL_FRAMES} frames...")
-
-    # Render frames with rotation
-    for i in range(TOTAL_FRAMES):
-        # Rotate camera around the object
-        angle_per_frame = 360.0 / TOTAL_FRAMES
-        view_ctrl.rotate(angle_per_frame * 3.0, 0)  # Horizontal rotation
-
-        # Update and render
-        vis.poll_events()
-        vis.update_renderer()
-
-        # Capture frame
-        image = vis.capture_screen_float_buffer(do_render=True)
-        image = np.asarray(image)
-        image = (image * 255).astype(np.uint8)
-        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
-
-        video_writer.write(image)
-
-        # Progress indicator
-        if (i + 1) % 30 == 0:
-            print(f"    Frame {i + 1}/{TOTAL_FRAMES}")
+    # Precompute one orbit step per frame and apply it to the initial extrinsic
+    params = view_ctrl.convert_to_pinhole_camera_parameters()
+    extrinsic0 = params.extrinsic.copy()
+    angles = np.linspace(0, 2 * np.pi, TOTAL_FRAMES, endpoint=False)
+    rotations = _rot_y(angles)
+
+    # Setup video writer. One FFmpeg process per file: files render concurrently
+    # across workers, and a shared segmenting encoder would misassign every
+    # later video if a single file failed partway through.
+    video_writer = open_video_writer(output_path, video_encoder)
+
+    # Encode on a background thread so the next frame renders meanwhile
+    frame_queue = queue.Queue(maxsize=ENCODER_QUEUE_SIZE)
+    encoder_errors = []
+    encoder_thread = threading.Thread(
+        target=_encoder_worker, args=(frame_queue, video_writer, encoder_errors)
+    )
+    encoder_thread.start()
+
+    print(f"  [{model_name}] Rendering {TOTAL_FRAMES} frames...")
+
+    try:
+        # Render frames with rotation
+        for i in range(TOTAL_FRAMES):
+            # Stop early if the encoder has failed
+            if encoder_errors:
+                break
+
+            # Orbit camera around the object (geometry is centered at the origin)
+            params.extrinsic = extrinsic0 @ rotations[i]
+            view_ctrl.convert_from_pinhole_camera_parameters(params)
+
+            # Update and render
+            vis.update_renderer()
+
+            # Capture frame. The float buffer is the only in-memory readback the
+            # legacy Visualizer exposes; capture_screen_image() would add a PNG
+            # encode/decode round trip per frame, which costs more than it saves.
+            # Each capture is a new buffer, so it is queued without copying.
+            image = vis.capture_screen_float_buffer(do_render=True)
+            frame_queue.put(np.asarray(image))
+
+            # Progress indicator
+            if (i + 1) % 30 == 0:
+                print(f"    [{model_name}] Frame {i + 1}/{TOTAL_FRAMES}")
+    finally:
+        # Always stop the encoder thread, even if rendering failed
+        frame_queue.put(None)
+        encoder_thread.join()
+        video_writer.close()
+
+    if encoder_errors:
+        raise encoder_errors[0]
+
+    print(f"  [{model_name}] Saved: {output_path}")
+
+
+# Per-worker visualizer and encoder settings, see _init_worker() and _get_visualizer()
+_visualizer = None
+_video_encoder = None
+_hardware_sessions = None
+
+
+def _init_worker(video_encoder, hardware_sessions):
+    """Store the encoder settings shared by all files in this worker."""
+    global _video_encoder, _hardware_sessions
+    _video_encoder = video_encoder
+    _hardware_sessions = hardware_sessions
+
+
+def _get_visualizer():
+    """Return this worker's visualizer, creating it on first use."""
+    global _visualizer
+    if _visualizer is None:
+        _visualizer = create_visualizer()
+        # Pool workers skip atexit handlers, so close the window via a finalizer
+        multiprocessing.util.Finalize(None, _visualizer.destroy_window, exitpriority=10)
+    return _visualizer
+
+
+def _process_one(ply_path_str):
+    """Load, normalize and render a single PLY file (runs in a worker process)."""
+    ply_path = Path(ply_path_str)
+    model_name = ply_path.stem  # e.g., "cat_gt" or "cat_pred"
+    output_path = os.path.join(OUTPUT_DIR, f"{model_name}.mp4")
+
+    print(f"\nProcessing: {model_name}")
+
+    try:
+        # Load geometry
+        geometry, geo_type = load_ply_with_colors(str(ply_path))
+        print(f"  [{model_name}] Loaded as: {geo_type}")
+
+        # Check if has colors
+        if geo_type == "mesh":
+            has_colors = geometry.has_vertex_colors()
+        else:
+            has_colors = geometry.has_colors()
+        print(f"  [{model_name}] Has colors: {has_colors}")
+
+        # Center and scale
+        geometry = center_and_scale(geometry)
+
+        # Use the hardware encoder only while a session is free (shared
+        # across workers); otherwise encode this file in software
+        video_encoder = _video_encoder
+        hardware_session = False
+        if video_encoder != SOFTWARE_ENCODER:
+            hardware_session = _hardware_sessions.acquire(block=False)
+            if not hardware_session:
+                video_encoder = SOFTWARE_ENCODER
+
+        # Render video
+        try:
+            render_rotating_video(_get_visualizer(), geometry, geo_type, output_path, model_name, video_encoder)
+        finally:
+            if hardware_session:
+                _hardware_sessions.release()
 
-    video_writer.release()
-    vis.destroy_window()
-    print(f"  Saved: {output_path}")
+    except Exception as e:
+        print(f"  [{model_name}] ERROR: {e}")
 
 
 def main():
@@ -140,33 +454,22 @@ def main():
     print(f"Found {len(ply_files)} PLY files")
     print("-" * 50)
 
-    for ply_path in sorted(ply_files):
-        model_name = ply_path.stem  # e.g., "cat_gt" or "cat_pred"
-        output_path = os.path.join(OUTPUT_DIR, f"{model_name}.mp4")
-
-        print(f"\nProcessing: {model_name}")
-
+    # Pick the video encoder once for all files
+    video_encoder = select_video_encoder()
+    print(f"Video encoder: {video_encoder[0]}")
+
+    # Render files in parallel; each worker process reuses its own visualizer
+    max_workers = min(len(ply_files), os.cpu_count() or 1)
+    hardware_sessions = multiprocessing.BoundedSemaphore(MAX_HARDWARE_SESSIONS)
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_init_worker,
+        initargs=(video_encoder, hardware_sessions),
+    ) as executor:
         try:
-            # Load geometry
-            geometry, geo_type = load_ply_with_colors(str(ply_path))
-            print(f"  Loaded as: {geo_type}")
-
-            # Check if has colors
-            if geo_type == "mesh":
-                has_colors = geometry.has_vertex_colors()
-            else:
-                has_colors = geometry.has_colors()
-            print(f"  Has colors: {has_colors}")
-
-            # Center and scale
-            geometry = center_and_scale(geometry)
-
-            # Render video
-            render_rotating_video(geometry, geo_type, output_path, model_name)
-
-        except Exception as e:
-            print(f"  ERROR: {e}")
-            continue
+            list(executor.map(_process_one, [str(p) for p in sorted(ply_files)]))
+        except BrokenProcessPool as e:
+            # A worker died outright (e.g. crashed in the GL driver)
+            print(f"\nERROR: rendering worker terminated unexpectedly: {e}")
 
     print("\n" + "=" * 50)
     print("Done! Videos saved to:", OUTPUT_DIR)
@@ -10,7 +10,10 @@ Usage:
 
 import pyvista as pv
 import numpy as np
+import multiprocessing.util
 import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 
 # Configuration
@@ -18,73 +21,174 @@ INPUT_DIR = "assets/models"
 OUTPUT_DIR = "assets/videos"
 VIDEO_WIDTH = 640
 VIDEO_HEIGHT = 480
+RENDER_WIDTH = 320  # Frames are rendered at this size and upscaled by FFmpeg
+RENDER_HEIGHT = 240
 FPS = 30
 DURATION_SECONDS = 6
 TOTAL_FRAMES = FPS * DURATION_SECONDS
+CAMERA_VIEW_ANGLE = 30.0  # Default of a fresh pv.Plotter, before zoom
 
+# FFmpeg filter upscaling rendered frames to the output video size
+_UPSCALE_PARAMS = ["-vf", f"scale={VIDEO_WIDTH}:{VIDEO_HEIGHT}:flags=lanczos"]
 
-def render_model_video(ply_path, output_path):
+
+def create_plotter():
+    """Create the off-screen plotter shared by all renders in a process."""
+    plotter = pv.Plotter(off_screen=True, window_size=[RENDER_WIDTH, RENDER_HEIGHT])
+    plotter.set_background([0.1, 0.1, 0.15])  # Dark blue-gray
+
+    # Keep per-frame rendering cheap: no anti-aliasing or depth peeling
+    plotter.disable_anti_aliasing()
+    plotter.disable_depth_peeling()
+
+    # Add lighting
+    plotter.add_light(pv.Light(position=(5, 5, 5), intensity=0.8))
+
+    return plotter
+
+
+def orbit_positions(position, focal_point, view_up, angles):
+    """Rotate the camera position about the view-up axis through the focal point.
+
+    Equivalent to setting camera.azimuth to each angle (in radians), computed
+    for all frames at once.
+    """
+    focal_point = np.asarray(focal_point, dtype=float)
+    offset = np.asarray(position, dtype=float) - focal_point
+    axis = np.asarray(view_up, dtype=float)
+    axis /= np.linalg.norm(axis)
+
+    # Rodrigues' rotation formula, broadcast over all angles
+    cos = np.cos(angles)[:, None]
+    sin = np.sin(angles)[:, None]
+    return (focal_point + offset * cos + np.cross(axis, offset) * sin
+            + axis * np.dot(axis, offset) * (1 - cos))
+
+
+def as_rgb_scalars(colors):
+    """Return vertex colors in a form add_mesh(rgb=True) can use directly.
+
+    Dispatches on dtype instead of scanning values: integer colors are
+    0-255 and passed as uint8 (no copy when already uint8), floats are
+    assumed to be in [0, 1].
+    """
+    if colors.dtype == np.uint8 or not np.issubdtype(colors.dtype, np.integer):
+        return colors
+    return colors.astype(np.uint8)
+
+
+def render_model_video(plotter, ply_path, output_path):
     """Render a rotating video of a PLY model."""
 
     # Load the PLY file
+    model_name = Path(ply_path).stem
     mesh = pv.read(ply_path)
 
-    # Check for colors
-    has_colors = 'RGB' in mesh.array_names or 'RGBA' in mesh.array_names or mesh.n_arrays > 0
+    # Check for colors (array_names builds a new list on every access)
+    array_names = mesh.array_names
+    names = set(array_names)
+    has_rgb = 'RGB' in names
+    has_rgba = 'RGBA' in names
 
-    # Create plotter (off-screen rendering)
-    plotter = pv.Plotter(off_screen=True, window_size=[VIDEO_WIDTH, VIDEO_HEIGHT])
-    plotter.set_background([0.1, 0.1, 0.15])  # Dark blue-gray
+    # Drop the previous file's actors
+    plotter.clear_actors()
+
+    # Compute point normals once for Gouraud shading, instead of smooth_shading
+    if mesh.faces.size > 0:
+        mesh.compute_normals(cell_normals=False, point_normals=True, inplace=True)
+
+    # Style shared by every add_mesh call; point and line sizes are scaled
+    # so they keep the theme's size in the upscaled output video
+    output_scale = RENDER_WIDTH / VIDEO_WIDTH
+    mesh_style = dict(
+        interpolation='gouraud',
+        point_size=pv.global_theme.point_size * output_scale,
+        line_width=pv.global_theme.line_width * output_scale,
+    )
 
     # Add mesh with colors
-    if 'RGB' in mesh.array_names:
-        # Normalize RGB if needed
-        rgb = mesh['RGB']
-        if rgb.max() > 1:
-            rgb = rgb / 255.0
-        plotter.add_mesh(mesh, scalars=rgb, rgb=True, smooth_shading=True)
-    elif 'RGBA' in mesh.array_names:
-        rgba = mesh['RGBA']
-        if rgba.max() > 1:
-            rgba = rgba / 255.0
-        plotter.add_mesh(mesh, scalars=rgba[:, :3], rgb=True, smooth_shading=True)
-    elif mesh.n_arrays > 0:
+    if has_rgb:
+        plotter.add_mesh(mesh, scalars=as_rgb_scalars(mesh['RGB']), rgb=True, **mesh_style)
+    elif has_rgba:
+        plotter.add_mesh(mesh, scalars=as_rgb_scalars(mesh['RGBA'][:, :3]), rgb=True, **mesh_style)
+    elif array_names:
         # Use first available scalar array (might be saliency values)
-        scalar_name = mesh.array_names[0]
-        plotter.add_mesh(mesh, scalars=scalar_name, cmap='jet', smooth_shading=True)
+        scalar_name = array_names[0]
+        plotter.add_mesh(mesh, scalars=scalar_name, cmap='jet', **mesh_style)
     else:
         # No colors, use default
-        plotter.add_mesh(mesh, color='lightblue', smooth_shading=True)
-
-    # Add lighting
-    plotter.add_light(pv.Light(position=(5, 5, 5), intensity=0.8))
-    plotter.add_light(pv.Light(position=(-5, -5, 5), intensity=0.4))
+        plotter.add_mesh(mesh, color='lightblue', **mesh_style)
 
-    # Center camera on mesh
-    plotter.reset_camera()
+    # Center camera on mesh. The plotter is reused, so first undo the previous
+    # file's zoom (which narrows the view angle) to frame it like a fresh plotter
+    plotter.camera.view_angle = CAMERA_VIEW_ANGLE
+    plotter.view_isometric()
     plotter.camera.zoom(1.3)
 
     # Open movie file
-    plotter.open_movie(output_path, framerate=FPS, quality=8)
+    plotter.open_movie(
+        output_path, framerate=FPS, quality=8,
+        ffmpeg_params=list(_UPSCALE_PARAMS),
+    )
+
+    try:
+        # Render rotating frames
+        print(f"  [{model_name}] Rendering {TOTAL_FRAMES} frames...")
+        camera = plotter.camera
+        angles = np.linspace(0, 2 * np.pi, TOTAL_FRAMES, endpoint=False)
+        positions = orbit_positions(camera.position, camera.focal_point, camera.up, angles)
+
+        for i in range(TOTAL_FRAMES):
+            # Rotate camera around the model
+            camera.position = positions[i]
+
+            # Write frame
+            plotter.write_frame()
+
+            # Progress
+            if (i + 1) % 30 == 0:
+                print(f"    [{model_name}] Frame {i + 1}/{TOTAL_FRAMES}")
+    finally:
+        # Close movie, keeping the plotter alive for the next file
+        plotter.mwriter.close()
+        plotter.mwriter = None
 
-    # Render rotating frames
-    print(f"  Rendering {TOTAL_FRAMES} frames...")
-    angle_step = 360 / TOTAL_FRAMES
+    print(f"  [{model_name}] Saved: {output_path}")
 
-    for i in range(TOTAL_FRAMES):
-        # Rotate camera around the model
-        plotter.camera.azimuth = i * angle_step
 
-        # Write frame
-        plotter.write_frame()
+# Plotter owned by the current worker process, see _get_plotter()
+_plotter = None
 
-        # Progress
-        if (i + 1) % 30 == 0:
-            print(f"    Frame {i + 1}/{TOTAL_FRAMES}")
 
-    # Close movie
-    plotter.close()
-    print(f"  Saved: {output_path}")
+def _init_worker():
+    """Force off-screen rendering in each worker process."""
+    os.environ["PYVISTA_OFF_SCREEN"] = "true"
+    pv.OFF_SCREEN = True
+
+
+def _get_plotter():
+    """Return this worker's plotter, creating it on first use."""
+    global _plotter
+    if _plotter is None:
+        _plotter = create_plotter()
+        # Pool workers skip atexit handlers, so close the plotter via a finalizer
+        multiprocessing.util.Finalize(None, _plotter.close, exitpriority=10)
+    return _plotter
+
+
+def _process_one(ply_path_str):
+    """Render a single PLY file (runs in a worker process)."""
+    model_name = Path(ply_path_str).stem
+    output_path = os.path.join(OUTPUT_DIR, f"{model_name}.mp4")
+
+    print(f"\nProcessing: {model_name}")
+
+    try:
+        render_model_video(_get_plotter(), ply_path_str, output_path)
+    except Exception as e:
+        print(f"  [{model_name}] ERROR: {e}")
+        import traceback
+        traceback.print_exc()
 
 
 def main():
@@ -106,18 +210,14 @@ def main():
     # Enable off-screen rendering (only needed on Linux)
     # pv.start_xvfb()  # Commented out - not needed on Windows
 
-    for ply_path in sorted(ply_files):
-        model_name = ply_path.stem
-        output_path = os.path.join(OUTPUT_DIR, f"{model_name}.mp4")
-
-        print(f"\nProcessing: {model_name}")
-
+    # Render files in parallel; each worker process reuses its own plotter
+    max_workers = min(len(ply_files), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker) as executor:
         try:
-            render_model_video(str(ply_path), output_path)
-        except Exception as e:
-            print(f"  ERROR: {e}")
-            import traceback
-            traceback.print_exc()
+            list(executor.map(_process_one, [str(p) for p in sorted(ply_files)]))
+        except BrokenProcessPool as e:
+            # A worker died outright (e.g. crashed in the GL driver)
+            print(f"\nERROR: rendering worker terminated unexpectedly: {e}")
 
     print("\n" + "=" * 50)
     print("Done! Videos saved to:", OUTPUT_DIR)